@@ -0,0 +1,66 @@
+"""
+Pytest fixtures for the API tests in test_api.py.
+"""
+import httpx
+import pytest
+
+from test_api import (
+    BASE_URL, PATH_START, START_PAYLOAD, make_session, path_game, post_json, print_response,
+    probe_backend, probe_scenario_endpoint
+)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--granular",
+        action="store_true",
+        help="Always run each game-flow step as its own test, even when the batched scenario is available"
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "granular: per-step game-flow test, skipped when test_chained_scenario can run (unless --granular)")
+
+
+@pytest.fixture(scope="session")
+def session():
+    """Shared HTTP client; skips the API tests when the backend isn't running."""
+    s = make_session()
+    try:
+        probe_backend(s)
+    except httpx.ConnectError:
+        s.close()
+        pytest.skip(f"Backend not running at {BASE_URL}")
+    yield s
+    s.close()
+
+
+@pytest.fixture(scope="session")
+def scenario_available(session):
+    """Whether the backend serves /dev/run_scenario for the batched game-flow test."""
+    return probe_scenario_endpoint(session)
+
+
+@pytest.fixture(autouse=True)
+def skip_granular_when_batched(request):
+    """
+    Skip per-step game-flow tests when test_chained_scenario covers them.
+    
+    Without --granular they still run if the server has the dev endpoint
+    disabled, so the game flow is never skipped entirely.
+    """
+    if "granular" not in request.keywords or request.config.getoption("--granular"):
+        return
+    if request.getfixturevalue("scenario_available"):
+        pytest.skip("covered by test_chained_scenario; use --granular")
+
+
+@pytest.fixture
+def game_id(session):
+    """Start a fresh game for one test and delete it afterwards."""
+    response = post_json(session, PATH_START, START_PAYLOAD)
+    body = print_response(response, decode=True)
+    assert response.status_code == 200 and body, response.text
+    gid = body["game_id"]
+    yield gid
+    session.delete(path_game(gid))
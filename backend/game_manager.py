@@ -3,32 +3,185 @@ Game Manager
 Manages chess game state in-memory with unique game IDs.
 """
 import uuid
+from collections import OrderedDict
+from functools import lru_cache
 import chess
+import chess.polyglot
 from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+_original_board_fen = chess.BaseBoard.board_fen
+_original_piece_at = chess.BaseBoard.piece_at
+
+
+def _fast_board_fen(self: chess.BaseBoard, *, promoted: Optional[bool] = False) -> str:
+    """
+    Drop-in replacement for chess.BaseBoard.board_fen.
+    
+    Reads the piece bitboards directly instead of building a Piece object
+    per square via piece_at(). Boards that override piece_at fall back to
+    the original implementation.
+    """
+    if type(self).piece_at is not _original_piece_at:
+        return _original_board_fen(self, promoted=promoted)
+    
+    occupied = self.occupied
+    white = self.occupied_co[chess.WHITE]
+    promoted_mask = self.promoted if promoted else 0
+    bitboards = (
+        (self.pawns, "P", "p"),
+        (self.knights, "N", "n"),
+        (self.bishops, "B", "b"),
+        (self.rooks, "R", "r"),
+        (self.queens, "Q", "q"),
+        (self.kings, "K", "k"),
+    )
+    
+    builder: List[str] = []
+    empty = 0
+    
+    for square in chess.SQUARES_180:
+        mask = chess.BB_SQUARES[square]
+        
+        if not occupied & mask:
+            empty += 1
+        else:
+            if empty:
+                builder.append(str(empty))
+                empty = 0
+            for bitboard, white_symbol, black_symbol in bitboards:
+                if bitboard & mask:
+                    builder.append(white_symbol if white & mask else black_symbol)
+                    break
+            if promoted_mask & mask:
+                builder.append("~")
+        
+        if mask & chess.BB_FILE_H:
+            if empty:
+                builder.append(str(empty))
+                empty = 0
+            if square != chess.H1:
+                builder.append("/")
+    
+    return "".join(builder)
+
+
+# Every FEN sent to clients goes through board.fen(), which is dominated by board_fen()
+if chess.BaseBoard.board_fen is _original_board_fen:
+    chess.BaseBoard.board_fen = _fast_board_fen
+
+
+@lru_cache(maxsize=4096)
+def _uci_to_move(move_uci: str) -> chess.Move:
+    """Parse a UCI move, reusing Move objects for repeated moves across games."""
+    return chess.Move.from_uci(move_uci)
+
 
 @dataclass
 class GameState:
     """Represents the state of a chess game."""
     game_id: str
-    board_fen: str
     player_color: str  # "white" or "black"
     bot_elo: int  # 1320-3000
     move_history: List[str]
-    status: str  # "ongoing", "checkmate", "stalemate", "draw"
-    winner: Optional[str]  # "white", "black", or None
     current_turn: str  # "white" or "black"
     created_at: str
     last_move: Optional[str]
+    board: chess.Board = field(default_factory=chess.Board, repr=False, compare=False)  # Live board, not serialized
+    _legal_cache: Optional[Dict[str, chess.Move]] = field(default=None, init=False, repr=False, compare=False)  # UCI -> legal move for current position
+    _zobrist_counts: Dict[int, int] = field(default_factory=dict, init=False, repr=False, compare=False)  # Position hash -> occurrences
+    _board_fen: str = field(default="", init=False, repr=False, compare=False)  # Last serialized FEN, read via board_fen
+    _fen_dirty: bool = field(default=True, init=False, repr=False, compare=False)  # _board_fen is stale
+    _status: str = field(default="ongoing", init=False, repr=False, compare=False)  # "ongoing", "checkmate", "stalemate", "draw"
+    _winner: Optional[str] = field(default=None, init=False, repr=False, compare=False)  # "white", "black", or None
+    _status_dirty: bool = field(default=False, init=False, repr=False, compare=False)  # _status/_winner are stale
+    _repetitions: int = field(default=1, init=False, repr=False, compare=False)  # Occurrences of current position
+    
+    @property
+    def board_fen(self) -> str:
+        """FEN of the current position, re-serialized only after moves."""
+        if self._fen_dirty:
+            self._board_fen = self.board.fen()
+            self._fen_dirty = False
+        return self._board_fen
+    
+    @property
+    def status(self) -> str:
+        """Game status: "ongoing", "checkmate", "stalemate" or "draw"."""
+        self._resolve_status()
+        return self._status
+    
+    @property
+    def winner(self) -> Optional[str]:
+        """Winning color ("white" or "black"), or None."""
+        self._resolve_status()
+        return self._winner
+    
+    def _resolve_status(self):
+        """Run terminal checks only on the first status/winner read after a move."""
+        if self._status_dirty:
+            self._update_status()
+            self._status_dirty = False
+    
+    def _update_status(self):
+        """Update status and winner based on board state."""
+        board = self.board
+        
+        # One pass covers checkmate, stalemate and insufficient material;
+        # draw claims use the O(1) counters instead of claim_draw=True
+        outcome = board.outcome()
+        
+        if outcome is not None and outcome.termination == chess.Termination.CHECKMATE:
+            self._status = "checkmate"
+            # Winner is the player who just moved (opposite of current turn)
+            self._winner = "white" if outcome.winner == chess.WHITE else "black"
+            logger.info(f"Game {self.game_id} ended: checkmate, winner: {self._winner}")
+        elif outcome is not None and (
+            outcome.termination == chess.Termination.STALEMATE or board.is_stalemate()
+        ):
+            # outcome() reports insufficient material ahead of stalemate
+            self._status = "stalemate"
+            self._winner = None
+            logger.info(f"Game {self.game_id} ended: stalemate")
+        elif outcome is not None:
+            # Insufficient material, seventy-five moves or fivefold repetition
+            self._status = "draw"
+            self._winner = None
+            logger.info(f"Game {self.game_id} ended: {outcome.termination.name.lower().replace('_', ' ')}")
+        elif board.halfmove_clock < 8:
+            # Too few reversible plies for a fifty-move or threefold draw
+            self._status = "ongoing"
+        elif board.halfmove_clock >= 100:
+            self._status = "draw"
+            self._winner = None
+            logger.info(f"Game {self.game_id} ended: fifty-move rule")
+        elif self._repetitions >= 3:
+            self._status = "draw"
+            self._winner = None
+            logger.info(f"Game {self.game_id} ended: threefold repetition")
+        else:
+            self._status = "ongoing"
     
     def to_dict(self):
-        """Convert to dictionary."""
-        return asdict(self)
+        """Convert to dictionary (internal repr=False fields are left out)."""
+        # Shares move_history rather than deep-copying it; the dict is only
+        # used for read-only JSON serialization
+        return {
+            "game_id": self.game_id,
+            "board_fen": self.board_fen,
+            "player_color": self.player_color,
+            "bot_elo": self.bot_elo,
+            "move_history": self.move_history,
+            "status": self.status,
+            "winner": self.winner,
+            "current_turn": self.current_turn,
+            "created_at": self.created_at,
+            "last_move": self.last_move,
+        }
 
 
 class GameManager:
@@ -38,10 +191,20 @@ class GameManager:
     MIN_ELO = 1320
     MAX_ELO = 3000
     
-    def __init__(self):
-        """Initialize the game manager with empty game storage."""
-        self.games: Dict[str, GameState] = {}
-        logger.info("Game manager initialized")
+    # Default cap on games kept in memory
+    DEFAULT_MAX_GAMES = 1000
+    
+    def __init__(self, max_games: int = DEFAULT_MAX_GAMES):
+        """
+        Initialize the game manager with empty game storage.
+        
+        Args:
+            max_games: Maximum number of games kept in memory; the least
+                recently used game is evicted beyond this
+        """
+        self.games: "OrderedDict[str, GameState]" = OrderedDict()
+        self.max_games = max(1, max_games)
+        logger.info(f"Game manager initialized (max {self.max_games} games)")
     
     def create_game(self, player_color: str, bot_elo: int) -> GameState:
         """
@@ -66,20 +229,25 @@ class GameManager:
         
         game_state = GameState(
             game_id=game_id,
-            board_fen=board.fen(),
             player_color=player_color,
             bot_elo=bot_elo,
             move_history=[],
-            status="ongoing",
-            winner=None,
             current_turn="white",
             created_at=datetime.utcnow().isoformat(),
-            last_move=None
+            last_move=None,
+            board=board
         )
         
+        self._record_position(game_state)
+        
         self.games[game_id] = game_state
         logger.info(f"Created game {game_id}: {player_color} vs bot (ELO {bot_elo})")
         
+        # Evict least recently used games beyond the cap
+        while len(self.games) > self.max_games:
+            evicted_id, _ = self.games.popitem(last=False)
+            logger.info(f"Evicted game {evicted_id} (limit {self.max_games} games)")
+        
         return game_state
     
     def get_game(self, game_id: str) -> Optional[GameState]:
@@ -92,7 +260,10 @@ class GameManager:
         Returns:
             GameState object or None if not found
         """
-        return self.games.get(game_id)
+        game = self.games.get(game_id)
+        if game:
+            self.games.move_to_end(game_id)
+        return game
     
     def apply_move(self, game_id: str, move_uci: str) -> bool:
         """
@@ -110,27 +281,50 @@ class GameManager:
             logger.warning(f"Game {game_id} not found")
             return False
         
+        return self.apply_move_to(game, move_uci)
+    
+    def apply_move_to(self, game: GameState, move_uci: str) -> bool:
+        """
+        Apply a move to an already retrieved game, updating it in place.
+        
+        Args:
+            game: GameState object to update
+            move_uci: Move in UCI format (e.g., "e2e4")
+            
+        Returns:
+            True if move was applied successfully, False otherwise
+        """
+        game_id = game.game_id
+        
         try:
-            board = chess.Board(game.board_fen)
-            move = chess.Move.from_uci(move_uci)
+            board = game.board
+            
+            # Validate move is legal; a hit in the legal-move map (filled by
+            # /state) is enough, otherwise test just this move. Misses still
+            # go to is_legal, which also accepts alternate castling notation
+            # such as e1h1 that the map doesn't list
+            move = game._legal_cache.get(move_uci) if game._legal_cache is not None else None
+            if move is None:
+                move = _uci_to_move(move_uci)
+                if not board.is_legal(move):
+                    move = None
             
-            # Validate move is legal
-            if move not in board.legal_moves:
+            if move is None:
                 logger.warning(f"Illegal move {move_uci} in game {game_id}")
                 return False
             
             # Apply move
             board.push(move)
+            game._legal_cache = None
+            game._repetitions = self._record_position(game)
             
-            # Update game state
-            game.board_fen = board.fen()
+            # Update game state; FEN and status are resolved on first read
+            game._fen_dirty = True
+            game._status_dirty = True
             game.move_history.append(move_uci)
             game.last_move = move_uci
             game.current_turn = "white" if board.turn == chess.WHITE else "black"
             
-            # Check game status
-            self._update_game_status(game, board)
-            
             logger.info(f"Applied move {move_uci} in game {game_id}")
             return True
             
@@ -138,37 +332,26 @@ class GameManager:
             logger.error(f"Error applying move {move_uci} in game {game_id}: {e}")
             return False
     
-    def _update_game_status(self, game: GameState, board: chess.Board):
+    def _record_position(self, game: GameState) -> int:
         """
-        Update game status based on board state.
+        Count an occurrence of the current position for repetition detection.
+        
+        Positions before a capture or pawn move can never recur, so the
+        counts are reset whenever the halfmove clock does.
         
         Args:
             game: GameState object to update
-            board: Current chess board
+            
+        Returns:
+            Number of times the current position has occurred
         """
-        if board.is_checkmate():
-            game.status = "checkmate"
-            # Winner is the player who just moved (opposite of current turn)
-            game.winner = "black" if board.turn == chess.WHITE else "white"
-            logger.info(f"Game {game.game_id} ended: checkmate, winner: {game.winner}")
-        elif board.is_stalemate():
-            game.status = "stalemate"
-            game.winner = None
-            logger.info(f"Game {game.game_id} ended: stalemate")
-        elif board.is_insufficient_material():
-            game.status = "draw"
-            game.winner = None
-            logger.info(f"Game {game.game_id} ended: insufficient material")
-        elif board.can_claim_fifty_moves():
-            game.status = "draw"
-            game.winner = None
-            logger.info(f"Game {game.game_id} ended: fifty-move rule")
-        elif board.can_claim_threefold_repetition():
-            game.status = "draw"
-            game.winner = None
-            logger.info(f"Game {game.game_id} ended: threefold repetition")
-        else:
-            game.status = "ongoing"
+        if game.board.halfmove_clock == 0:
+            game._zobrist_counts.clear()
+        
+        position_hash = chess.polyglot.zobrist_hash(game.board)
+        count = game._zobrist_counts.get(position_hash, 0) + 1
+        game._zobrist_counts[position_hash] = count
+        return count
     
     def get_legal_moves(self, game_id: str) -> List[str]:
         """
@@ -184,8 +367,24 @@ class GameManager:
         if not game:
             return []
         
-        board = chess.Board(game.board_fen)
-        return [move.uci() for move in board.legal_moves]
+        return list(self._legal_move_map(game))
+    
+    def _legal_move_map(self, game: GameState) -> Dict[str, chess.Move]:
+        """
+        Get legal moves for current position, generating them at most once per ply.
+        
+        The UCI -> Move map serves both get_legal_moves and apply_move_to, so
+        validating and parsing a cached move is one dict lookup.
+        
+        Args:
+            game: GameState object
+            
+        Returns:
+            Dict mapping UCI strings to legal moves
+        """
+        if game._legal_cache is None:
+            game._legal_cache = {move.uci(): move for move in game.board.generate_legal_moves()}
+        return game._legal_cache
     
     def delete_game(self, game_id: str) -> bool:
         """
@@ -203,6 +402,28 @@ class GameManager:
             return True
         return False
     
+    def prune_games(self, max_age_hours: float) -> int:
+        """
+        Delete games created more than max_age_hours ago.
+        
+        Args:
+            max_age_hours: Maximum game age in hours
+            
+        Returns:
+            Number of games deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        expired = [
+            game_id for game_id, game in self.games.items()
+            if datetime.fromisoformat(game.created_at) < cutoff
+        ]
+        for game_id in expired:
+            del self.games[game_id]
+        
+        if expired:
+            logger.info(f"Pruned {len(expired)} games older than {max_age_hours}h")
+        return len(expired)
+    
     def get_all_games(self) -> List[GameState]:
         """Get all active games."""
         return list(self.games.values())
@@ -4,12 +4,18 @@ Provides REST API for playing chess against Stockfish.
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import chess
 import logging
 import os
+import posixpath
+import shutil
 from contextlib import asynccontextmanager
+from urllib.parse import unquote
 
 from stockfish_engine import StockfishEngine
 from game_manager import GameManager, GameState
@@ -23,106 +29,164 @@ logger = logging.getLogger(__name__)
 
 # Global instances
 game_manager: Optional[GameManager] = None
-stockfish: Optional[StockfishEngine] = None
+stockfish_engines: List[StockfishEngine] = []
+# Idle engines; a SimpleEngine is not thread-safe, so each serves one search at a time
+stockfish_pool: Optional["asyncio.Queue[StockfishEngine]"] = None
+engine_executor: Optional[ThreadPoolExecutor] = None
+
+# Number of Stockfish processes (each runs single-threaded); MAX_STOCKFISH_POOL
+# only caps the CPU-based default, an explicit STOCKFISH_POOL_SIZE is used as given
+MAX_STOCKFISH_POOL = 4
+STOCKFISH_POOL_SIZE = max(1, int(os.getenv("STOCKFISH_POOL_SIZE", min(os.cpu_count() or 1, MAX_STOCKFISH_POOL))))
+
+# Game retention settings
+MAX_GAMES = int(os.getenv("MAX_GAMES", GameManager.DEFAULT_MAX_GAMES))
+GAME_TTL_HOURS = float(os.getenv("GAME_TTL_HOURS", 24))
+PRUNE_INTERVAL_SECONDS = 600
+
+# Set ENABLE_DEV_ENDPOINTS=1 to serve /dev/* test helpers (off in production)
+ENABLE_DEV_ENDPOINTS = os.getenv("ENABLE_DEV_ENDPOINTS") == "1"
+
+
+def find_stockfish_path() -> str:
+    """Look for Stockfish in the usual install locations, then on PATH."""
+    logger.info("STOCKFISH_PATH not set, attempting auto-detection...")
+    
+    # Try common Debian/Ubuntu location FIRST (Railway uses Debian packages)
+    debian_paths = ["/usr/games/stockfish", "/usr/bin/stockfish", "/usr/local/bin/stockfish"]
+    for path in debian_paths:
+        if os.path.exists(path) and os.access(path, os.X_OK):
+            logger.info(f"✓ Found executable Stockfish at: {path}")
+            return path
+        elif os.path.exists(path):
+            logger.info(f"Found {path} but not executable")
+    
+    # If not found, try shutil.which
+    stockfish_in_path = shutil.which("stockfish")
+    if stockfish_in_path:
+        logger.info(f"✓ Found Stockfish in PATH: {stockfish_in_path}")
+        return stockfish_in_path
+    
+    logger.error("✗ Stockfish not found in any location!")
+    logger.error("Please set STOCKFISH_PATH environment variable")
+    # List directories for debugging
+    for bindir in ["/usr/bin", "/usr/games", "/usr/local/bin"]:
+        if os.path.exists(bindir):
+            try:
+                files = [f for f in os.listdir(bindir) if 'stock' in f.lower()]
+                if files:
+                    logger.error(f"  Stockfish-related files in {bindir}: {files}")
+            except Exception as e:
+                logger.warning(f"  Cannot list {bindir}: {e}")
+    
+    # Use fallback - will likely fail but at least we tried
+    logger.warning("Using fallback path: stockfish")
+    return "stockfish"
+
+
+def start_stockfish_engines(stockfish_path: str):
+    """
+    Fill the engine pool from the given Stockfish binary.
+    
+    Raises:
+        RuntimeError: If the path is unusable or an engine fails to start
+    """
+    logger.info(f"Attempting to initialize Stockfish from: {stockfish_path}")
+    
+    # Debug: Check file system
+    logger.info(f"Current working directory: {os.getcwd()}")
+    logger.info(f"os.path.exists('{stockfish_path}'): {os.path.exists(stockfish_path)}")
+    logger.info(f"os.path.isfile('{stockfish_path}'): {os.path.isfile(stockfish_path)}")
+    
+    # Verify the file exists and is executable before passing to engine
+    if stockfish_path != "stockfish":  # Skip check for fallback
+        if not os.path.exists(stockfish_path):
+            # Additional debugging
+            logger.error(f"Path does not exist: {stockfish_path}")
+            logger.error(f"Checking parent directory: {os.path.dirname(stockfish_path)}")
+            parent_dir = os.path.dirname(stockfish_path)
+            if os.path.exists(parent_dir):
+                logger.error(f"Parent directory exists, contents:")
+                try:
+                    contents = os.listdir(parent_dir)
+                    logger.error(f"  {contents}")
+                except Exception as e:
+                    logger.error(f"  Cannot list directory: {e}")
+            raise RuntimeError(f"Stockfish path does not exist: {stockfish_path}")
+        if not os.access(stockfish_path, os.X_OK):
+            raise RuntimeError(f"Stockfish path exists but is not executable: {stockfish_path}")
+    
+    for _ in range(STOCKFISH_POOL_SIZE):
+        stockfish_engines.append(StockfishEngine(stockfish_path))
+    logger.info(f"✅ Stockfish initialized successfully! ({len(stockfish_engines)} engines)")
+
+
+async def prune_games_periodically():
+    """Background task that deletes games older than GAME_TTL_HOURS."""
+    while True:
+        await asyncio.sleep(PRUNE_INTERVAL_SECONDS)
+        if game_manager:
+            game_manager.prune_games(GAME_TTL_HOURS)
+
+
+async def get_bot_move(game: GameState) -> Tuple[chess.Move, Optional[int]]:
+    """Ask an idle Stockfish for a move off the event loop so other requests keep flowing."""
+    loop = asyncio.get_running_loop()
+    engine = await stockfish_pool.get()
+    try:
+        return await loop.run_in_executor(
+            engine_executor,
+            lambda: engine.get_best_move(game.board, game.bot_elo, game_id=game.game_id)
+        )
+    finally:
+        stockfish_pool.put_nowait(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize and cleanup resources."""
-    global game_manager, stockfish
+    global game_manager, stockfish_pool, engine_executor
     
     # Startup
     logger.info("Starting Chess API backend...")
     
     # Initialize game manager
-    game_manager = GameManager()
+    game_manager = GameManager(max_games=MAX_GAMES)
+    prune_task = asyncio.create_task(prune_games_periodically())
+    stockfish_pool = asyncio.Queue()
+    engine_executor = ThreadPoolExecutor(max_workers=STOCKFISH_POOL_SIZE, thread_name_prefix="stockfish")
     
     # Initialize Stockfish
-    import subprocess
-    import shutil
-    
     stockfish_path = os.getenv("STOCKFISH_PATH")
     logger.info(f"STOCKFISH_PATH environment variable: {stockfish_path}")
     
     if not stockfish_path:
-        logger.info("STOCKFISH_PATH not set, attempting auto-detection...")
-        
-        # Try common Debian/Ubuntu location FIRST (Railway uses Debian packages)
-        debian_paths = ["/usr/games/stockfish", "/usr/bin/stockfish", "/usr/local/bin/stockfish"]
-        for path in debian_paths:
-            if os.path.exists(path) and os.access(path, os.X_OK):
-                stockfish_path = path
-                logger.info(f"✓ Found executable Stockfish at: {path}")
-                break
-            elif os.path.exists(path):
-                logger.info(f"Found {path} but not executable")
-        
-        # If not found, try shutil.which
-        if not stockfish_path:
-            stockfish_in_path = shutil.which("stockfish")
-            if stockfish_in_path:
-                stockfish_path = stockfish_in_path
-                logger.info(f"✓ Found Stockfish in PATH: {stockfish_path}")
-    
-    if not stockfish_path:
-        logger.error("✗ Stockfish not found in any location!")
-        logger.error("Please set STOCKFISH_PATH environment variable")
-        # List directories for debugging
-        for bindir in ["/usr/bin", "/usr/games", "/usr/local/bin"]:
-            if os.path.exists(bindir):
-                try:
-                    files = [f for f in os.listdir(bindir) if 'stock' in f.lower()]
-                    if files:
-                        logger.error(f"  Stockfish-related files in {bindir}: {files}")
-                except Exception as e:
-                    logger.warning(f"  Cannot list {bindir}: {e}")
-        
-        # Use fallback - will likely fail but at least we tried
-        stockfish_path = "stockfish"
-        logger.warning(f"Using fallback path: {stockfish_path}")
-    
+        stockfish_path = find_stockfish_path()
     try:
-        logger.info(f"Attempting to initialize Stockfish from: {stockfish_path}")
-        
-        # Debug: Check file system
-        logger.info(f"Current working directory: {os.getcwd()}")
-        logger.info(f"os.path.exists('{stockfish_path}'): {os.path.exists(stockfish_path)}")
-        logger.info(f"os.path.isfile('{stockfish_path}'): {os.path.isfile(stockfish_path)}")
-        
-        # Verify the file exists and is executable before passing to engine
-        if stockfish_path != "stockfish":  # Skip check for fallback
-            if not os.path.exists(stockfish_path):
-                # Additional debugging
-                logger.error(f"Path does not exist: {stockfish_path}")
-                logger.error(f"Checking parent directory: {os.path.dirname(stockfish_path)}")
-                parent_dir = os.path.dirname(stockfish_path)
-                if os.path.exists(parent_dir):
-                    logger.error(f"Parent directory exists, contents:")
-                    try:
-                        contents = os.listdir(parent_dir)
-                        logger.error(f"  {contents}")
-                    except Exception as e:
-                        logger.error(f"  Cannot list directory: {e}")
-                raise RuntimeError(f"Stockfish path does not exist: {stockfish_path}")
-            if not os.access(stockfish_path, os.X_OK):
-                raise RuntimeError(f"Stockfish path exists but is not executable: {stockfish_path}")
-        
-        stockfish = StockfishEngine(stockfish_path)
-        logger.info(f"✅ Stockfish initialized successfully!")
+        start_stockfish_engines(stockfish_path)
     except Exception as e:
         logger.error(f"❌ Failed to initialize Stockfish: {e}")
         logger.error(f"   Exception type: {type(e).__name__}")
         import traceback
         logger.error(f"   Traceback:\n{traceback.format_exc()}")
-        logger.warning("⚠️  Server will start but games will fail without Stockfish")
-        logger.warning("   Please check STOCKFISH_PATH environment variable")
+        if stockfish_engines:
+            logger.warning(f"⚠️  Running with {len(stockfish_engines)} of {STOCKFISH_POOL_SIZE} Stockfish engines")
+        else:
+            logger.warning("⚠️  Server will start but games will fail without Stockfish")
+            logger.warning("   Please check STOCKFISH_PATH environment variable")
+    
+    for engine in stockfish_engines:
+        stockfish_pool.put_nowait(engine)
     
     yield
     
     # Shutdown
     logger.info("Shutting down Chess API backend...")
-    if stockfish:
-        stockfish.close()
+    prune_task.cancel()
+    engine_executor.shutdown(wait=True)
+    for engine in stockfish_engines:
+        engine.close()
+    stockfish_engines.clear()
 
 
 # Create FastAPI app
@@ -130,6 +194,7 @@ app = FastAPI(
     title="Chess Web App API",
     description="REST API for playing chess against Stockfish",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -195,6 +260,21 @@ class GameStateResponse(BaseModel):
     legal_moves: List[str]
 
 
+class ScenarioStep(BaseModel):
+    method: str = Field(..., pattern="^(GET|POST|DELETE)$")
+    path: str = Field(..., pattern="^/", description="API path; {game_id} is filled from earlier steps")
+    body: Optional[Dict[str, Any]] = None
+
+
+class RunScenarioRequest(BaseModel):
+    steps: List[ScenarioStep] = Field(..., min_length=1, max_length=20)
+
+
+class ScenarioStepResult(BaseModel):
+    status: int
+    body: Any = None
+
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -202,7 +282,7 @@ async def root():
     return {
         "message": "Chess Web App API",
         "status": "running",
-        "stockfish_ready": stockfish is not None,
+        "stockfish_ready": bool(stockfish_engines),
         "active_games": game_manager.get_game_count() if game_manager else 0
     }
 
@@ -224,7 +304,7 @@ async def start_game(request: StartGameRequest):
     if not game_manager:
         raise HTTPException(status_code=500, detail="Game manager not initialized")
     
-    if not stockfish:
+    if not stockfish_engines:
         raise HTTPException(status_code=500, detail="Stockfish engine not available")
     
     try:
@@ -242,19 +322,14 @@ async def start_game(request: StartGameRequest):
         
         # If player is black, bot (white) makes first move
         if request.player_color == "black":
-            board = chess.Board(game.board_fen)
-            bot_move, _ = stockfish.get_best_move(board, request.bot_elo)
-            
-            # Apply bot move
-            game_manager.apply_move(game.game_id, bot_move.uci())
-            updated_game = game_manager.get_game(game.game_id)
+            bot_move, _ = await get_bot_move(game)
             
-            if not updated_game:
-                raise HTTPException(status_code=500, detail="Failed to retrieve game after bot move")
+            # Apply bot move (updates game in place)
+            game_manager.apply_move_to(game, bot_move.uci())
             
             response_data["bot_move"] = bot_move.uci()
-            response_data["board_fen"] = updated_game.board_fen
-            response_data["current_turn"] = updated_game.current_turn
+            response_data["board_fen"] = game.board_fen
+            response_data["current_turn"] = game.current_turn
         
         logger.info(f"Started game {game.game_id}")
         return response_data
@@ -275,7 +350,7 @@ async def player_move(request: PlayerMoveRequest):
     if not game_manager:
         raise HTTPException(status_code=500, detail="Game manager not initialized")
     
-    if not stockfish:
+    if not stockfish_engines:
         raise HTTPException(status_code=500, detail="Stockfish engine not available")
     
     game = game_manager.get_game(request.game_id)
@@ -287,23 +362,15 @@ async def player_move(request: PlayerMoveRequest):
     
     try:
         # Validate it's player's turn
-        board = chess.Board(game.board_fen)
-        player_turn = game.player_color == "white" and board.turn == chess.WHITE or \
-                      game.player_color == "black" and board.turn == chess.BLACK
+        player_turn = game.player_color == game.current_turn
         
         if not player_turn:
             raise HTTPException(status_code=400, detail="Not player's turn")
         
-        # Apply player move
-        if not game_manager.apply_move(request.game_id, request.move):
+        # Apply player move (updates game in place)
+        if not game_manager.apply_move_to(game, request.move):
             raise HTTPException(status_code=400, detail="Invalid move")
         
-        # Get updated game state
-        game = game_manager.get_game(request.game_id)
-        
-        if not game:
-            raise HTTPException(status_code=500, detail="Failed to retrieve game after player move")
-        
         # If game ended after player move, return status
         if game.status != "ongoing":
             return PlayerMoveResponse(
@@ -316,15 +383,10 @@ async def player_move(request: PlayerMoveRequest):
             )
         
         # Get bot move
-        board = chess.Board(game.board_fen)
-        bot_move, evaluation = stockfish.get_best_move(board, game.bot_elo)
+        bot_move, evaluation = await get_bot_move(game)
         
         # Apply bot move
-        game_manager.apply_move(request.game_id, bot_move.uci())
-        game = game_manager.get_game(request.game_id)
-        
-        if not game:
-            raise HTTPException(status_code=500, detail="Failed to retrieve game after bot move")
+        game_manager.apply_move_to(game, bot_move.uci())
         
         return PlayerMoveResponse(
             success=True,
@@ -397,6 +459,79 @@ async def list_games():
     }
 
 
+def scenario_step_error(path: str) -> Optional[str]:
+    """
+    Return why a scenario step path is not allowed, or None if it is.
+    
+    The path is checked the way the router will see it: percent-decoded
+    (repeatedly, so double encoding can't hide a segment) and with dot
+    segments and repeated slashes collapsed.
+    """
+    raw_path = path.split("?", 1)[0].split("#", 1)[0]
+    if raw_path.startswith("//"):
+        return "Scenario step paths must be relative to this API"
+    
+    decoded = raw_path
+    while True:
+        unquoted = unquote(decoded)
+        if unquoted == decoded:
+            break
+        decoded = unquoted
+    
+    normalized = posixpath.normpath("/" + decoded.lstrip("/"))
+    if normalized == "/dev" or normalized.startswith("/dev/"):
+        return "Scenario steps cannot call /dev endpoints"
+    return None
+
+
+async def run_scenario(request: RunScenarioRequest):
+    """
+    Run a sequence of API calls in a single request.
+    
+    Used by smoke tests to replace several round trips with one. Steps run
+    in order against this app in-process; "{game_id}" in a step's path or
+    string body values is replaced with the last game_id a step returned.
+    Every step is validated before any of them runs.
+    """
+    import httpx
+    
+    for index, step in enumerate(request.steps):
+        error = scenario_step_error(step.path)
+        if error:
+            raise HTTPException(status_code=400, detail=f"Step {index}: {error}")
+    
+    results = []
+    game_id = ""
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://scenario") as client:
+        for step in request.steps:
+            path = step.path.replace("{game_id}", game_id)
+            body = None
+            if step.body is not None:
+                body = {
+                    key: value.replace("{game_id}", game_id) if isinstance(value, str) else value
+                    for key, value in step.body.items()
+                }
+            
+            response = await client.request(step.method, path, json=body)
+            try:
+                data = response.json()
+            except ValueError:
+                data = response.text
+            
+            if isinstance(data, dict) and isinstance(data.get("game_id"), str):
+                game_id = data["game_id"]
+            results.append(ScenarioStepResult(status=response.status_code, body=data))
+    
+    return results
+
+
+# Test-only; needs httpx (requirements-dev.txt)
+if ENABLE_DEV_ENDPOINTS:
+    app.post("/dev/run_scenario", response_model=List[ScenarioStepResult])(run_scenario)
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
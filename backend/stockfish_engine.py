@@ -4,11 +4,42 @@ Manages Stockfish initialization and move generation with ELO-based difficulty.
 """
 import chess
 import chess.engine
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (Skill Level, UCI_LimitStrength, UCI_Elo or None)
+EngineConfig = Tuple[int, bool, Optional[int]]
+
+
+def _build_elo_table(min_elo: int, max_elo: int) -> Dict[int, Tuple[EngineConfig, float]]:
+    """
+    Precompute engine options and move-time multiplier for every ELO rating.
+    
+    Args:
+        min_elo: Lowest supported ELO rating
+        max_elo: Highest supported ELO rating (full strength)
+        
+    Returns:
+        Dict mapping ELO to (engine config, move-time multiplier)
+    """
+    table = {}
+    for elo in range(min_elo, max_elo + 1):
+        rating_factor = (elo - min_elo) / (max_elo - min_elo)
+        
+        if elo >= max_elo:
+            # Maximum strength - no limitations
+            config = (20, False, None)
+        else:
+            # Limited strength mode, skill level mapped linearly from ELO (0-20)
+            skill_level = max(0, min(20, int(rating_factor * 20)))
+            config = (skill_level, True, elo)
+        
+        # Higher ratings get slightly more time to think
+        table[elo] = (config, 1 + rating_factor * 0.5)
+    return table
+
 
 class StockfishEngine:
     """Wrapper for Stockfish chess engine with ELO rating management."""
@@ -17,6 +48,9 @@ class StockfishEngine:
     MIN_ELO = 1320
     MAX_ELO = 3000
     
+    # ELO -> (engine config, move-time multiplier), one entry per rating
+    _ELO_TABLE = _build_elo_table(MIN_ELO, MAX_ELO)
+    
     def __init__(self, stockfish_path: str):
         """
         Initialize Stockfish engine.
@@ -26,12 +60,15 @@ class StockfishEngine:
         """
         self.stockfish_path = stockfish_path
         self.engine: Optional[chess.engine.SimpleEngine] = None
+        self._last_config: Optional[EngineConfig] = None
         self._init_engine()
     
     def _init_engine(self):
         """Initialize the Stockfish engine."""
         try:
             self.engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+            # Engines run side by side in a pool, so keep each to one search thread
+            self.engine.configure({"Threads": 1})
             logger.info("Stockfish engine initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Stockfish: {e}")
@@ -41,7 +78,8 @@ class StockfishEngine:
         self, 
         board: chess.Board, 
         elo_rating: int = 1500,
-        move_time: float = 0.2
+        move_time: float = 0.2,
+        game_id: Optional[str] = None
     ) -> Tuple[chess.Move, Optional[int]]:
         """
         Get best move from Stockfish based on ELO rating.
@@ -50,6 +88,8 @@ class StockfishEngine:
             board: Current chess board state
             elo_rating: Target ELO rating (1320-3000)
             move_time: Time limit for move calculation in seconds
+            game_id: Game identifier; the engine is sent ``ucinewgame`` only
+                when this changes, so its hash table survives within a game
             
         Returns:
             Tuple of (best_move, score_cp) where score_cp is centipawn evaluation
@@ -57,36 +97,29 @@ class StockfishEngine:
         if not self.engine:
             raise RuntimeError("Stockfish engine not initialized")
         
-        # Clamp ELO to valid range
-        elo_rating = max(self.MIN_ELO, min(self.MAX_ELO, elo_rating))
+        # Look up engine options and move time for this rating
+        entry = self._ELO_TABLE.get(elo_rating)
+        if entry is None:
+            # Clamp ELO to valid range (and to an int key for non-integer ratings)
+            entry = self._ELO_TABLE[int(max(self.MIN_ELO, min(self.MAX_ELO, elo_rating)))]
+        config, time_multiplier = entry
         
-        # Convert ELO to skill level for proper engine configuration
-        skill_level = self._elo_to_skill(elo_rating)
-        
-        # Configure engine options based on ELO rating
-        if elo_rating >= self.MAX_ELO:
-            # Maximum strength - no limitations
-            self.engine.configure({
-                "Skill Level": 20,
-                "UCI_LimitStrength": False,
-            })
-        else:
-            # Limited strength mode
-            self.engine.configure({
-                "Skill Level": skill_level,
-                "UCI_LimitStrength": True,
-                "UCI_Elo": elo_rating
-            })
-        
-        # Calculate move time based on rating
-        # Higher ratings get slightly more time to think
-        rating_factor = (elo_rating - self.MIN_ELO) / (self.MAX_ELO - self.MIN_ELO)
-        adjusted_time = move_time * (1 + rating_factor * 0.5)
+        # Skip the UCI round-trip when the options are already in effect
+        if config != self._last_config:
+            options = {
+                "Skill Level": config[0],
+                "UCI_LimitStrength": config[1],
+            }
+            if config[2] is not None:
+                options["UCI_Elo"] = config[2]
+            self.engine.configure(options)
+            self._last_config = config
         
         # Get best move with time limit
         result = self.engine.play(
             board,
-            chess.engine.Limit(time=adjusted_time),
+            chess.engine.Limit(time=move_time * time_multiplier),
+            game=game_id,
             info=chess.engine.INFO_SCORE
         )
         
@@ -103,20 +136,6 @@ class StockfishEngine:
         
         return result.move, score_cp
     
-    def _elo_to_skill(self, elo_rating: int) -> int:
-        """
-        Convert ELO rating to Stockfish skill level (0-20).
-        
-        Args:
-            elo_rating: ELO rating (1320-3000)
-            
-        Returns:
-            Skill level 0-20
-        """
-        # Linear mapping from ELO range to skill level
-        skill = int((elo_rating - self.MIN_ELO) / (self.MAX_ELO - self.MIN_ELO) * 20)
-        return max(0, min(20, skill))
-    
     def get_evaluation(self, board: chess.Board, depth: int = 15) -> Optional[int]:
         """
         Get static evaluation of current position.
@@ -0,0 +1,141 @@
+"""
+GameManager Tests
+Drive GameManager directly; no server or Stockfish needed.
+
+Run with:
+    pytest test_game_manager.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from game_manager import GameManager
+
+KNIGHT_SHUFFLE = ["g1f3", "g8f6", "f3g1", "f6g8"]
+
+
+@pytest.fixture
+def manager():
+    return GameManager()
+
+
+@pytest.fixture
+def game(manager):
+    return manager.create_game("white", 1500)
+
+
+def play(manager, game, moves):
+    """Apply moves in order, failing on the first one that is rejected."""
+    for move in moves:
+        assert manager.apply_move_to(game, move), move
+
+
+def test_threefold_repetition_is_a_draw_on_ply_8(manager, game):
+    """The start position occurring a third time ends the game."""
+    for move in (KNIGHT_SHUFFLE * 2)[:-1]:
+        play(manager, game, [move])
+        assert game.status == "ongoing"
+    
+    play(manager, game, [KNIGHT_SHUFFLE[-1]])
+    assert game.status == "draw"
+    assert game.winner is None
+
+
+def test_second_repetition_is_still_ongoing(manager, game):
+    """A position seen twice is not a draw yet."""
+    play(manager, game, KNIGHT_SHUFFLE)
+    
+    assert game._repetitions == 2
+    assert game.status == "ongoing"
+
+
+def test_repetition_counts_reset_with_halfmove_clock(manager, game):
+    """A pawn move makes earlier positions unreachable, so their counts are dropped."""
+    play(manager, game, KNIGHT_SHUFFLE)
+    assert len(game._zobrist_counts) == 4
+    
+    play(manager, game, ["e2e4"])
+    assert len(game._zobrist_counts) == 1
+    assert game._repetitions == 1
+
+
+def test_fifty_move_rule(manager, game):
+    """The 100th reversible ply is a draw even without a repetition."""
+    game.board.set_fen("k7/8/8/8/8/8/R7/K7 w - - 99 60")
+    
+    play(manager, game, ["a2b2"])
+    assert game.board.halfmove_clock == 100
+    assert game.status == "draw"
+
+
+def test_checkmate_sets_winner(manager, game):
+    """Fool's mate: winner is read before status to check resolution order."""
+    play(manager, game, ["f2f3", "e7e5", "g2g4", "d8h4"])
+    
+    assert game.winner == "black"
+    assert game.status == "checkmate"
+
+
+def test_stalemate_with_insufficient_material(manager, game):
+    """Stalemate is reported even when outcome() would call it insufficient material."""
+    game.board.set_fen("k7/8/1K6/4B3/8/8/8/8 w - - 0 1")
+    
+    play(manager, game, ["e5d6"])
+    assert game.status == "stalemate"
+    assert game.winner is None
+
+
+def test_board_fen_follows_moves(manager, game):
+    """board_fen is re-serialized after a move, not left stale."""
+    start_fen = game.board_fen
+    play(manager, game, ["e2e4"])
+    
+    assert game.board_fen != start_fen
+    assert game.board_fen == game.board.fen()
+    assert game.to_dict()["board_fen"] == game.board_fen
+
+
+@pytest.mark.parametrize("warm_cache", [False, True])
+def test_move_legality_does_not_depend_on_cache(manager, game, warm_cache):
+    """Castling written king-takes-rook (e1h1) is accepted whether or not /state ran."""
+    play(manager, game, ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6"])
+    if warm_cache:
+        manager.get_legal_moves(game.game_id)
+    
+    assert manager.apply_move_to(game, "e1h1")
+    assert game.current_turn == "black"
+    assert not manager.apply_move_to(game, "e8e6")
+
+
+def test_get_legal_moves_returns_a_copy(manager, game):
+    """A list returned before a move is not emptied by the move."""
+    legal_moves = manager.get_legal_moves(game.game_id)
+    play(manager, game, ["e2e4"])
+    
+    assert len(legal_moves) == 20
+    assert "e2e4" in legal_moves
+
+
+def test_lru_eviction():
+    """Beyond max_games, the least recently used game is evicted."""
+    manager = GameManager(max_games=2)
+    first = manager.create_game("white", 1500)
+    second = manager.create_game("white", 1500)
+    
+    manager.get_game(first.game_id)  # first is now more recent than second
+    manager.create_game("black", 1500)
+    
+    assert manager.get_game_count() == 2
+    assert manager.get_game(first.game_id) is first
+    assert manager.get_game(second.game_id) is None
+
+
+def test_prune_games(manager):
+    """Only games older than the cutoff are deleted."""
+    old = manager.create_game("white", 1500)
+    fresh = manager.create_game("white", 1500)
+    old.created_at = (datetime.utcnow() - timedelta(hours=25)).isoformat()
+    
+    assert manager.prune_games(24) == 1
+    assert manager.get_game(old.game_id) is None
+    assert manager.get_game(fresh.game_id) is fresh
@@ -0,0 +1,66 @@
+"""
+API Module Tests
+Check the /dev/run_scenario step guard in-process; no server or Stockfish needed.
+
+Run with:
+    pytest test_main.py
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from game_manager import GameManager
+
+
+@pytest.mark.parametrize("path", [
+    "/",
+    "/games",
+    "/start_game",
+    "/state/{game_id}",
+    "/game/{game_id}?force=1",
+    "/developer",
+])
+def test_scenario_step_allowed(path):
+    """Ordinary API paths (and lookalikes such as /developer) pass the guard."""
+    assert main.scenario_step_error(path) is None
+
+
+@pytest.mark.parametrize("path", [
+    "/dev/run_scenario",
+    "/dev",
+    "/%64ev/run_scenario",
+    "/%2564ev/run_scenario",
+    "/d%65v/run_scenario?x=1",
+    "/./dev/../dev/run_scenario",
+    "/games/../dev/run_scenario",
+    "/.//dev/run_scenario",
+])
+def test_scenario_step_rejects_dev_endpoints(path):
+    """Encoded, double-encoded and dot-segment spellings of /dev are all caught."""
+    assert main.scenario_step_error(path) == "Scenario steps cannot call /dev endpoints"
+
+
+@pytest.mark.parametrize("path", ["//x", "//evil.example/dev", "//"])
+def test_scenario_step_rejects_network_paths(path):
+    """Network-path references could point the in-process client at another host."""
+    assert main.scenario_step_error(path) == "Scenario step paths must be relative to this API"
+
+
+def test_run_scenario_validates_every_step_first(monkeypatch):
+    """A bad later step is rejected before earlier steps touch any game."""
+    manager = GameManager()
+    game = manager.create_game("white", 1500)
+    monkeypatch.setattr(main, "game_manager", manager)
+    request = main.RunScenarioRequest(steps=[
+        {"method": "DELETE", "path": f"/game/{game.game_id}"},
+        {"method": "POST", "path": "/%64ev/run_scenario", "body": {"steps": []}},
+    ])
+    
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.run_scenario(request))
+    
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail.startswith("Step 1:")
+    assert manager.get_game(game.game_id) is game
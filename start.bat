@@ -38,7 +38,8 @@ if not exist venv (
     python -m venv venv
 )
 call venv\Scripts\activate.bat
-pip install -r requirements.txt
+REM requirements-dev.txt includes requirements.txt plus the test tools used by option 5
+pip install -r requirements-dev.txt
 call deactivate
 cd..
 